@@ -4,11 +4,16 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, unquote, urlparse, parse_qs
 import sys
 from tqdm import tqdm
+from tqdm.utils import CallbackIOWrapper
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import threading
 import time
 import json
+import html
+import shutil
+import random
+import ssl
 
 # User Credentials - FILL THESE IN
 USERNAME = ""
@@ -21,21 +26,63 @@ TOKEN_URL = f"{AUTH_BASE}/token"
 AUTH_URL = f"{AUTH_BASE}/auth"
 DEFAULT_CLIENT_ID = "eogdata-new-apache"
 REDIRECT_URI = "https://eogdata.mines.edu/oauth2callback"
-MAX_WORKERS = 4  # Number of concurrent downloads
-CACHE_FILE = "eog_files_cache.json"
+MAX_WORKERS = 16  # Number of concurrent downloads
+SCAN_WORKERS = 16  # Number of directory listings fetched concurrently in Phase 1
+CACHE_FILE = "eog_files_cache.jsonl"  # One [url, save_path] JSON array per line
+SIZES_CACHE_FILE = "eog_sizes_cache.jsonl"  # Remote size/ETag/Last-Modified per URL, one JSON object per line
+WRITE_BUFFER_SIZE = 1024 * 1024  # Read/write downloads in 1 MiB blocks
+POOL_MAXSIZE = 64  # Keep-alive connections kept open per host
+REQUEST_TIMEOUT = (15, 60)  # (connect, read) timeout in seconds for every request
+TOKEN_EXPIRY_MARGIN = 60  # Refresh the access token this many seconds before it expires
+MAX_BACKOFF = 60  # Upper bound (seconds) for the randomized retry delay
+LOGIN_WAIT_TIMEOUT = 30  # Max seconds a worker waits for another worker's re-login to finish
 
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
+# A single TLS context shared by every pooled connection, so the CA bundle is parsed once
+# and the same context survives re-logins (the session itself is never rebuilt)
+SSL_CONTEXT = ssl.create_default_context(cafile=requests.certs.where())
+
+class SharedSSLAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all use SSL_CONTEXT.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = SSL_CONTEXT
+        return super().init_poolmanager(*args, **kwargs)
+
+# Matches the href of every <a> tag in an Apache autoindex listing (run on raw bytes)
+_HREF_RE = re.compile(rb'<a\s[^>]*?href="([^"]*)"', re.IGNORECASE)
+
+# Keep only *.avg_rade9h.tif.gz and *.cf_cvg.tif.gz
+# (excludes .tif, *.cvg.tif.gz, *.avg_rade9h.masked.tif.gz, etc.)
+_KEEP_RE = re.compile(r'\.(?:avg_rade9h|cf_cvg)\.tif\.gz$')
+
+# Directory names (with trailing slash, as they appear in listing links) to skip
+EXCLUDED_DIRS = frozenset({'vcmslcfg/'})
+
+# In-memory view of the sizes cache (url -> latest entry), kept in sync by record_file_info()
+known_sizes = {}
+sizes_cache_lock = threading.Lock()
+
 class EOGAuthenticator:
     # ... (init and _create_session remain the same)
-    def __init__(self, username, password, client_id=None, client_secret=None):
+    def __init__(self, username, password, client_id=None, client_secret=None, seed=None):
         self.username = username
         self.password = password
         self.client_id = client_id or DEFAULT_CLIENT_ID
         self.client_secret = client_secret
-        self.lock = threading.Lock()
+        # Logins are serialized through login_cond; login_generation counts successful
+        # logins so workers can tell whether the session was renewed after their request
+        self.login_cond = threading.Condition()
+        self.login_generation = 0
+        self.login_in_progress = False
         self.session = self._create_session()
+        self.token_expiry = None  # time.monotonic() deadline for the current access token
+        self.refresher = None
+        # Source of retry jitter; pass a seed for reproducible backoff delays (e.g. in tests)
+        self.random = random.Random(seed)
 
     def _create_session(self):
         """
@@ -51,14 +98,27 @@ class EOGAuthenticator:
             allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"]
         )
         
-        adapter = HTTPAdapter(max_retries=retries)
+        # Size the keep-alive pool for all workers; block instead of opening throwaway connections
+        adapter = SharedSSLAdapter(
+            max_retries=retries,
+            pool_connections=16,
+            pool_maxsize=POOL_MAXSIZE,
+            pool_block=True
+        )
         session.mount("https://", adapter)
         session.mount("http://", adapter)
         return session
 
     def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        # Unlike session.head, request() follows redirects, so expired sessions are still detected
+        return self.request('HEAD', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
         """
-        Wrapper for session.get with automatic retry on 401/403/503 and Connection Errors.
+        Wrapper for session.request with automatic retry on 401/403/503 and Connection Errors.
         Enforces a default timeout if not provided.
         """
         retry_count = 0
@@ -67,35 +127,35 @@ class EOGAuthenticator:
         
         # Set default timeout (connect, read) if not provided to prevent hanging
         if 'timeout' not in kwargs:
-            kwargs['timeout'] = (15, 60) # 15s connect, 60s read
+            kwargs['timeout'] = REQUEST_TIMEOUT
 
         while retry_count < max_retries:
+            # Refresh ahead of expiry instead of waiting for a 401
+            expiry = self.token_expiry
+            if expiry is not None and time.monotonic() >= expiry:
+                self._refresh_token_if_expired()
+
+            # Session generation this attempt is made with
+            generation = self.login_generation
+
             try:
                 # If streaming, we return the response object directly
-                response = self.session.get(url, **kwargs)
-                
-                # Check if we were redirected to login page (which returns 200 OK)
-                if response.url.startswith(AUTH_BASE):
-                     tqdm.write("Detected redirect to login page. Session expired.")
-                     fake_error = requests.exceptions.HTTPError("Session Expired")
-                     fake_error.response = response
-                     response.status_code = 401 
-                     raise fake_error
-                
-                response.raise_for_status()
-                return response
+                return self._checked_request(method, url, **kwargs)
 
             except requests.exceptions.HTTPError as e:
                 # ... (error handling remains similar, ensuring loops don't hang)
+                # Release the connection back to the pool before retrying or giving up
+                e.response.close()
                 status_code = e.response.status_code
                 if status_code in [401, 403, 503]:
                     tqdm.write(f"Encountered {status_code} error. Attempting re-login/retry ({retry_count + 1}/{max_retries})...")
-                    time.sleep(base_delay * (retry_count + 1) + (time.time() % 1))
-                    with self.lock:
-                        if self.login_and_get_session():
-                            tqdm.write("Re-login successful. Retrying request...")
-                        else:
-                            tqdm.write("Re-login failed.")
+                    # Only back off when the server is overloaded; an expired session is retried right away
+                    if status_code == 503:
+                        time.sleep(self._backoff_delay(retry_count, base_delay))
+                    if self._relogin(generation):
+                        tqdm.write("Session renewed. Retrying request...")
+                    else:
+                        tqdm.write("Re-login failed.")
                     retry_count += 1
                     continue
                 else:
@@ -103,40 +163,107 @@ class EOGAuthenticator:
 
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, 
                     requests.exceptions.ChunkedEncodingError) as e:
-                tqdm.write(f"Connection unstable: {e}. Rebuilding session and retrying ({retry_count + 1}/{max_retries})...")
-                time.sleep(base_delay * (retry_count + 1) + (time.time() % 1))
-                with self.lock:
-                    tqdm.write("Rebuilding session...")
-                    if self.login_and_get_session():
-                         tqdm.write("Session rebuilt and re-authenticated.")
-                    else:
-                         tqdm.write("Session rebuild failed, will try current session anyway.")
+                tqdm.write(f"Connection unstable: {e}. Re-authenticating and retrying ({retry_count + 1}/{max_retries})...")
+                time.sleep(self._backoff_delay(retry_count, base_delay))
+                if self._relogin(generation):
+                    tqdm.write("Session re-authenticated.")
+                else:
+                    tqdm.write("Re-authentication failed, will try current session anyway.")
                 retry_count += 1
                 continue
             
             except Exception as e:
                 tqdm.write(f"Unexpected error: {e}. Retrying...")
                 retry_count += 1
-                time.sleep(base_delay)
+                time.sleep(self._backoff_delay(retry_count, base_delay))
                 continue
                 
-        # If we exhausted retries, try one last time
-        return self.session.get(url, **kwargs)
+        # If we exhausted retries, try one last time (errors are raised to the caller)
+        return self._checked_request(method, url, **kwargs)
+
+    def _checked_request(self, method, url, **kwargs):
+        """
+        Issue a single request and raise HTTPError for error statuses or a redirect to
+        the login page, so failures are never mistaken for file content.
+        """
+        response = self.session.request(method, url, **kwargs)
+        
+        # Check if we were redirected to login page (which returns 200 OK)
+        if response.url.startswith(AUTH_BASE):
+             tqdm.write("Detected redirect to login page. Session expired.")
+             response.close()
+             fake_error = requests.exceptions.HTTPError("Session Expired")
+             fake_error.response = response
+             response.status_code = 401 
+             raise fake_error
+        
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            # Release the connection back to the pool
+            response.close()
+            raise
+        return response
+
+    def _backoff_delay(self, retry_count, base_delay):
+        """
+        Full-jitter exponential backoff: a random delay in [0, base_delay * 2^retry_count],
+        capped at MAX_BACKOFF, so concurrent workers don't retry in lockstep.
+        """
+        return self.random.uniform(0, min(MAX_BACKOFF, base_delay * (2 ** retry_count)))
+
+    def _relogin(self, generation):
+        """
+        Re-login after a request made at the given session generation failed.
+        If another worker already renewed the session since then, or is doing so right now,
+        wait for it and reuse the result instead of logging in again.
+        Returns True if a newer session is available.
+        """
+        with self.login_cond:
+            if self.login_generation > generation:
+                return True
+            if self.login_in_progress:
+                self.login_cond.wait_for(lambda: not self.login_in_progress, timeout=LOGIN_WAIT_TIMEOUT)
+                return self.login_generation > generation
+            self.login_in_progress = True
+
+        success = False
+        try:
+            success = self.login_and_get_session()
+        finally:
+            self._finish_login(success)
+        return success
+
+    def _finish_login(self, success):
+        # Bump the generation on success and wake every worker waiting in _relogin()
+        with self.login_cond:
+            self.login_in_progress = False
+            if success:
+                self.login_generation += 1
+            self.login_cond.notify_all()
 
     # ... (login methods remain the same)
     def login_and_get_session(self):
-        # Reset session to ensure clean state (clears old cookies/headers/connection pool)
-        self.session = self._create_session()
+        # Reset auth state in place; keeping the same session preserves the pooled
+        # keep-alive connections (and their TLS handshakes) across re-logins.
+        # The Authorization header is only replaced once a new token is issued,
+        # so requests in flight on other threads keep using the old one.
+        self.session.cookies.clear()
         
         # Try direct password grant first (fastest)
         tqdm.write(f"Attempting direct login with client_id='{self.client_id}'...")
         if self._login_password_grant():
             tqdm.write("Direct login successful.")
+            self._start_token_refresher()
             return True
         
+        # Browser flow relies on cookies, so there is no token lifetime to track
+        self.token_expiry = None
+
         # If failed and no secret provided (public client), try browser flow
         if not self.client_secret:
             tqdm.write("Direct login failed. Attempting browser simulation flow...")
+            self.session.headers.pop('Authorization', None)
             return self._login_browser_flow()
         
         return False
@@ -152,10 +279,21 @@ class EOGAuthenticator:
             payload['client_secret'] = self.client_secret
             
         try:
-            response = self.session.post(TOKEN_URL, data=payload)
+            # Don't send the stale bearer token to the token endpoint
+            response = self.session.post(TOKEN_URL, data=payload, headers={'Authorization': None}, timeout=REQUEST_TIMEOUT)
             if response.status_code == 200:
-                token = response.json().get('access_token')
+                token_data = response.json()
+                token = token_data.get('access_token')
                 self.session.headers.update({'Authorization': f'Bearer {token}'})
+                expires_in = token_data.get('expires_in')
+                if expires_in:
+                    # Short-lived tokens refresh halfway through their lifetime instead of
+                    # immediately, so the refresher never hammers the token endpoint
+                    expires_in = int(expires_in)
+                    lead_time = min(TOKEN_EXPIRY_MARGIN, expires_in // 2)
+                    self.token_expiry = time.monotonic() + expires_in - lead_time
+                else:
+                    self.token_expiry = None
                 return True
             else:
                 tqdm.write(f"Direct login failed: {response.text}")
@@ -163,6 +301,51 @@ class EOGAuthenticator:
             tqdm.write(f"Direct login error: {e}")
         return False
 
+    def _refresh_token_if_expired(self):
+        """
+        Renew the access token via password grant if it is (about to be) expired.
+        Safe to call from any thread; only the first caller past the deadline refreshes.
+        """
+        with self.login_cond:
+            # Another thread may already have refreshed (or be logging in); the current
+            # token is still valid for TOKEN_EXPIRY_MARGIN seconds, so don't wait for it
+            if self.login_in_progress or self.token_expiry is None or time.monotonic() < self.token_expiry:
+                return
+            self.login_in_progress = True
+
+        tqdm.write("Access token about to expire. Refreshing...")
+        success = False
+        try:
+            success = self._login_password_grant()
+            if not success:
+                # Stop refreshing preemptively; the 401 handler in request() takes over
+                tqdm.write("Token refresh failed. Will re-login on next 401.")
+                self.token_expiry = None
+        finally:
+            self._finish_login(success)
+
+    def _start_token_refresher(self):
+        """
+        Start a daemon thread that refreshes the token in the background,
+        so download workers never have to wait for it on the request path.
+        """
+        if self.refresher is not None and self.refresher.is_alive():
+            return
+        self.refresher = threading.Thread(target=self._token_refresh_loop, daemon=True)
+        self.refresher.start()
+
+    def _token_refresh_loop(self):
+        while True:
+            expiry = self.token_expiry
+            if expiry is None:
+                return
+            time.sleep(max(expiry - time.monotonic(), 0))
+            # If a worker is already logging in, wait for it instead of polling;
+            # a successful login moves token_expiry forward
+            with self.login_cond:
+                self.login_cond.wait_for(lambda: not self.login_in_progress)
+            self._refresh_token_if_expired()
+
     def _login_browser_flow(self):
         try:
             # Step 1: Get the login page
@@ -173,7 +356,7 @@ class EOGAuthenticator:
                 'scope': 'openid email',
                 'state': '12345' # Dummy state
             }
-            r = self.session.get(AUTH_URL, params=params)
+            r = self.session.get(AUTH_URL, params=params, timeout=REQUEST_TIMEOUT)
             r.raise_for_status()
             
             # Step 2: Parse form action
@@ -201,7 +384,7 @@ class EOGAuthenticator:
                     login_data[inp.get('name')] = inp.get('value')
             
             # Follow redirects automatically now to complete the flow (Keycloak -> App -> Original URL)
-            r_post = self.session.post(action_url, data=login_data, allow_redirects=True)
+            r_post = self.session.post(action_url, data=login_data, allow_redirects=True, timeout=REQUEST_TIMEOUT)
             
             # Check for Keycloak errors in the final page content if we didn't redirect away
             if "kc-feedback-text" in r_post.text or "pf-c-alert__title" in r_post.text:
@@ -220,7 +403,7 @@ class EOGAuthenticator:
 
     def _check_auth(self):
         try:
-            r = self.session.get(BASE_URL)
+            r = self.session.get(BASE_URL, timeout=REQUEST_TIMEOUT)
             if r.status_code == 200:
                 tqdm.write("Authentication verified.")
                 return True
@@ -243,12 +426,13 @@ def get_files_and_dirs(url, authenticator):
         tqdm.write(f"Failed to access {url}: {e}")
         return [], []
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # Directory listings only need the link targets, so a compiled regex over the
+    # raw bytes replaces building a full BeautifulSoup tree for every page
     files = []
     dirs = []
     
-    for link in soup.find_all('a'):
-        href = link.get('href')
+    for match in _HREF_RE.finditer(response.content):
+        href = html.unescape(match.group(1).decode('utf-8', 'replace'))
         # Skip parent directory links and query parameters
         if not href or href in ['../', './'] or href.startswith('?') or href.startswith('/'):
             continue
@@ -261,88 +445,138 @@ def get_files_and_dirs(url, authenticator):
             
     return files, dirs
 
+class PositionalWriter:
+    """
+    Minimal writable file object that writes at a tracked offset with os.pwrite().
+    Opening truncates the file to the starting offset, so the same code path
+    resumes a partial file or restarts it from scratch.
+    """
+    def __init__(self, path, offset=0):
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+        self.fd = os.open(path, flags, 0o666)
+        self.offset = offset
+        try:
+            os.ftruncate(self.fd, offset)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(self.fd, view, self.offset)
+            else:
+                # No pwrite on Windows
+                os.lseek(self.fd, self.offset, os.SEEK_SET)
+                written = os.write(self.fd, view)
+            self.offset += written
+            view = view[written:]
+        return len(data)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 def download_file(url, save_path, authenticator):
     """
     Download a single file with resume capability and progress bar.
+    If the sizes cache has a validator for the file, a partial file is resumed
+    with a single conditional (If-Range) GET.
     Returns True if successful (or skipped), False if failed.
     """
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
 
     # Check if file exists to resume
-    resume_header = {}
-    file_mode = 'wb'
     existing_size = 0
-    
     if os.path.exists(save_path):
         existing_size = os.path.getsize(save_path)
-        resume_header = {'Range': f'bytes={existing_size}-'}
-        file_mode = 'ab'
 
     try:
-        # Initial request to check total size and support for range
-        # Use authenticator.get() for robustness
-        r = authenticator.get(url, stream=True, headers=resume_header, timeout=(15, 60))
+        total_size = 0
+        resume_header = {}
+        if existing_size > 0:
+            # Look up the latest entry; an earlier attempt in this run may have updated it
+            with sizes_cache_lock:
+                remote_info = known_sizes.get(url)
+            validator = resume_validator(remote_info) if remote_info else None
+            if validator:
+                # Size and validator are already known; If-Range below guards against remote changes
+                total_size = remote_info['size']
+            else:
+                # HEAD returns the total size without transferring any of the body,
+                # so already complete files are skipped for the cost of one tiny request
+                # Use authenticator.head() for robustness
+                head_resp = authenticator.head(url)
+                head_resp.close()
+                total_size = int(head_resp.headers.get('content-length', 0))
+                remote_info = record_file_info(url, head_resp)
+                validator = resume_validator(remote_info) if remote_info else None
+
+            if total_size > 0 and existing_size == total_size:
+                tqdm.write(f"Skipping already completed file: {os.path.basename(save_path)}")
+                return True
+
+            if total_size > 0 and existing_size > total_size:
+                # File on disk is larger than server? Re-download
+                tqdm.write(f"File corruption detected. Re-downloading: {save_path}")
+                existing_size = 0
+            else:
+                resume_header = {'Range': f'bytes={existing_size}-'}
+                if validator:
+                    # Server answers 206 if the file is unchanged, otherwise 200 with the full new file
+                    resume_header['If-Range'] = validator
+
+        r = authenticator.get(url, stream=True, headers=resume_header)
         
         try:
-            # If server returns 416 Range Not Satisfiable, maybe the file is already complete
-            if r.status_code == 416:
-                # Check total size from a fresh HEAD request (or GET)
-                head_resp = authenticator.get(url, stream=False, timeout=(15, 60)) 
-                total_size = int(head_resp.headers.get('content-length', 0))
-                head_resp.close()
-                
-                if existing_size >= total_size:
-                    tqdm.write(f"Skipping already completed file: {os.path.basename(save_path)}")
-                    return True
-                else:
-                    # File on disk is larger than server? Re-download
-                    tqdm.write(f"File corruption detected. Re-downloading: {save_path}")
-                    os.remove(save_path)
+            # If status is 206, it means partial content (resume supported)
+            if r.status_code != 206:
+                if existing_size > 0:
+                    # File changed on the server, or range not supported: re-downloading from scratch
+                    tqdm.write(f"Cannot resume {os.path.basename(save_path)} (remote file changed or no range support). Re-downloading.")
                     existing_size = 0
-                    resume_header = {}
-                    file_mode = 'wb'
-                    
-                    # Close the 416 response before getting a new one
-                    r.close()
-                    # Re-request
-                    r = authenticator.get(url, stream=True, timeout=(15, 60))
+                # A full response describes the current remote file
+                total_size = int(r.headers.get('content-length', 0))
+                record_file_info(url, r)
 
-            r.raise_for_status()
-            
-            total_size = int(r.headers.get('content-length', 0))
-            
-            # If status is 206, it means partial content (resume supported)
-            if r.status_code == 206:
-                total_size += existing_size
-            elif r.status_code == 200 and existing_size > 0:
-                # Server doesn't support range, re-downloading from scratch
-                tqdm.write(f"Server doesn't support resume for {os.path.basename(save_path)}. Re-downloading.")
-                existing_size = 0
-                file_mode = 'wb'
+            if total_size == 0:
+                total_size = existing_size + int(r.headers.get('content-length', 0))
 
             desc = os.path.basename(save_path)
             if len(desc) > 30:
                 desc = desc[:27] + "..."
-            
-            # If file is already complete
-            if existing_size >= total_size and total_size > 0:
-                 tqdm.write(f"Skipping already completed file: {os.path.basename(save_path)}")
-                 return True
 
-            with open(save_path, file_mode) as f, tqdm(
+            # Data is read in WRITE_BUFFER_SIZE blocks and each block goes to disk with a single pwrite()
+            with PositionalWriter(save_path, existing_size) as f, tqdm(
                 desc=desc,
                 total=total_size,
                 initial=existing_size,
                 unit='iB',
                 unit_scale=True,
                 unit_divisor=1024,
-                leave=False # Don't leave progress bars to avoid clutter with threads
+                leave=False, # Don't leave progress bars to avoid clutter with threads
+                # Redraw at most every 0.5s / 1 MiB to keep contention on tqdm's lock low
+                mininterval=0.5,
+                miniters=WRITE_BUFFER_SIZE
             ) as bar:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        size = f.write(chunk)
-                        bar.update(size)
+                bar_file = CallbackIOWrapper(bar.update, f, "write")
+                if r.headers.get('content-encoding', 'identity') == 'identity':
+                    # Bytes on the wire are the file itself: copy straight from the raw socket stream
+                    shutil.copyfileobj(r.raw, bar_file, WRITE_BUFFER_SIZE)
+                else:
+                    # Content-Encoding must be decoded by requests
+                    for chunk in r.iter_content(chunk_size=WRITE_BUFFER_SIZE):
+                        if chunk:
+                            bar_file.write(chunk)
             return True
         finally:
             r.close()
@@ -351,16 +585,110 @@ def download_file(url, save_path, authenticator):
         tqdm.write(f"Error downloading {url}: {e}")
         return False
 
-def collect_files(url, base_save_dir, authenticator, all_files_list):
+def record_file_info(url, response):
+    """
+    Append the remote size and validators (ETag / Last-Modified) from a full (200) GET
+    or HEAD response to the sizes cache and update known_sizes, so later attempts and
+    runs can skip or resume the file without a HEAD request.
+    Returns the recorded entry, or None if the response is not usable.
+    """
+    # Only a 200 describes the whole file; error pages and partial responses must never
+    # be recorded, or they would later be taken as the file's real size
+    if response.status_code != 200:
+        return None
+
+    headers = response.headers
+    size = int(headers.get('content-length', 0))
+    if size <= 0:
+        return None
+
+    entry = {
+        'url': url,
+        'size': size,
+        'etag': headers.get('etag'),
+        'last_modified': headers.get('last-modified')
+    }
+    with sizes_cache_lock:
+        known_sizes[url] = entry
+        try:
+            with open(SIZES_CACHE_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        except Exception as e:
+            tqdm.write(f"Warning: Could not update sizes cache: {e}")
+    return entry
+
+def resume_validator(entry):
+    """
+    Return the value to send in If-Range for a sizes cache entry, or None.
+    Weak ETags cannot be used with If-Range, so Last-Modified is used instead.
+    """
+    etag = entry.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return entry.get('last_modified')
+
+def load_sizes_cache(cache_path):
+    """
+    Load the sizes cache into a dict of url -> entry (later entries win).
+    Returns an empty dict if the cache does not exist or cannot be read.
+    """
+    sizes = {}
+    if not os.path.exists(cache_path):
+        return sizes
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    sizes[entry['url']] = entry
+    except Exception as e:
+        print(f"Warning: Could not load sizes cache: {e}")
+    return sizes
+
+def build_local_index(root_dir):
+    """
+    Walk root_dir once with os.scandir and return {normalized path: size} for every file.
+    Directory entries carry their type, so only regular files need a stat call.
+    """
+    index = {}
+    pending_dirs = [root_dir]
+    while pending_dirs:
+        try:
+            with os.scandir(pending_dirs.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append(entry.path)
+                    elif entry.is_file():
+                        index[os.path.normpath(entry.path)] = entry.stat().st_size
+        except OSError:
+            continue
+    return index
+
+def filter_completed_files(files, remote_sizes, local_index):
+    """
+    Drop entries whose local file already matches the recorded remote size.
+    Works entirely in memory; no network requests or per-file stat calls are made.
+    """
+    remaining = []
+    for url, path in files:
+        info = remote_sizes.get(url)
+        if info is None or local_index.get(os.path.normpath(path)) != info['size']:
+            remaining.append((url, path))
+    return remaining
+
+def scan_directory(url, base_save_dir, authenticator, seen_files, files_lock, cache_file=None):
     """
-    Recursively scan directories and collect all files to download.
+    Scan a single directory listing.
+    Matching files are added as (url, save_path) keys of the seen_files dict (and streamed
+    to cache_file, if given); duplicates are rejected on insert. Returns the subdirectories to scan next.
     Filters applied:
     1. Skip 'vcmslcfg' directories (prefer 'vcmcfg').
     2. Only download .tif.gz files (skip .tif).
     3. Only download *.avg_rade9h.tif.gz and *.cf_cvg.tif.gz.
     """
     if not url.startswith(BASE_URL):
-        return
+        return []
 
     rel_path = unquote(url[len(BASE_URL):])
     rel_path = rel_path.lstrip('/')
@@ -369,32 +697,84 @@ def collect_files(url, base_save_dir, authenticator, all_files_list):
     tqdm.write(f"Scanning directory: {url}")
     files, dirs = get_files_and_dirs(url, authenticator)
     
+    found_files = []
     for file_url in files:
-        filename = unquote(file_url.split('/')[-1])
-        
-        # Filter: Only .tif.gz
-        if not filename.endswith('.tif.gz'):
-            continue
-            
-        # Filter: Specific file types
-        # Keep: *.avg_rade9h.tif.gz and *.cf_cvg.tif.gz
-        # Exclude: *.cvg.tif.gz, *.avg_rade9h.masked.tif.gz, etc.
-        if not (filename.endswith('.avg_rade9h.tif.gz') or filename.endswith('.cf_cvg.tif.gz')):
+        # Filter on the raw URL first; only unquote the names that are kept
+        if not _KEEP_RE.search(file_url):
             continue
 
+        filename = unquote(file_url[file_url.rfind('/') + 1:])
         save_path = os.path.join(current_save_dir, filename)
-        all_files_list.append((file_url, save_path))
+        found_files.append((file_url, save_path))
+
+    with files_lock:
+        for entry in found_files:
+            if entry in seen_files:
+                continue
+            seen_files[entry] = None
+            if cache_file is not None:
+                cache_file.write(json.dumps(entry) + '\n')
         
+    subdirs = []
     for dir_url in dirs:
         # Check directory name to filter out unwanted folders like 'vcmslcfg'
-        # dir_url ends with '/', so we strip it to get the name
-        dir_name = unquote(dir_url.rstrip('/').split('/')[-1])
+        # dir_url ends with '/', so the last segment keeps its trailing slash
+        dir_name = dir_url[dir_url.rfind('/', 0, -1) + 1:]
         
-        if dir_name == 'vcmslcfg':
+        if dir_name in EXCLUDED_DIRS:
             tqdm.write(f"Skipping excluded directory: {dir_name}")
             continue
             
-        collect_files(dir_url, base_save_dir, authenticator, all_files_list)
+        subdirs.append(dir_url)
+
+    return subdirs
+
+def collect_files(url, base_save_dir, authenticator, seen_files, cache_file=None):
+    """
+    Scan the directory tree below url breadth-first and collect all files to download.
+    Directory listings are independent, so they are fetched concurrently by a thread pool;
+    each finished listing submits its subdirectories back to the pool.
+    """
+    files_lock = threading.Lock()
+
+    executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS)
+    pending = {executor.submit(scan_directory, url, base_save_dir, authenticator, seen_files, files_lock, cache_file)}
+
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    subdirs = future.result()
+                except Exception as e:
+                    tqdm.write(f"Exception while scanning: {e}")
+                    continue
+
+                for dir_url in subdirs:
+                    pending.add(executor.submit(scan_directory, dir_url, base_save_dir, authenticator, seen_files, files_lock, cache_file))
+    except KeyboardInterrupt:
+        # Stop right away instead of draining every queued listing first
+        # (same as shutdown(cancel_futures=True), which needs Python 3.9+)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+        raise
+
+    executor.shutdown()
+
+def load_file_cache(cache_path):
+    """
+    Stream the JSONL file cache line by line.
+    Duplicate entries are dropped on the fly; returns a list of (url, save_path).
+    """
+    entries = {}
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                url, save_path = json.loads(line)
+                entries[(url, save_path)] = None
+    return list(entries)
 
 def main():
     print("=== EOG Data Downloader (Multi-threaded & Resume & Auto-Relogin & Cache) ===")
@@ -437,38 +817,47 @@ def main():
         choice = input("Use cached file list? (y/n) [y]: ").strip().lower()
         if choice in ('', 'y', 'yes'):
             try:
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                    # Cache format: list of [url, save_path]
-                    all_files_to_download = cached_data
+                all_files_to_download = load_file_cache(CACHE_FILE)
                 print(f"Loaded {len(all_files_to_download)} files from cache.")
             except Exception as e:
                 print(f"Error loading cache: {e}. Will rescan.")
     
     if not all_files_to_download:
         print("\nPhase 1: Scanning directory structure (this may take a while)...")
-        collect_files(BASE_URL, save_dir, authenticator, all_files_to_download)
-        
-        # Deduplicate files (remove duplicate URLs/paths)
-        # Convert list of lists/tuples to set of tuples for uniqueness
-        unique_files = list(set(tuple(item) for item in all_files_to_download))
-        if len(unique_files) < len(all_files_to_download):
-            print(f"Removed {len(all_files_to_download) - len(unique_files)} duplicate entries.")
-            all_files_to_download = unique_files
-        
-        # Save to cache
+        # Entries are streamed to a temporary file as they are discovered;
+        # it only replaces the cache once the scan has finished
+        partial_cache = CACHE_FILE + '.part'
         try:
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(all_files_to_download, f, indent=2)
-            print(f"Scan complete. Saved {len(all_files_to_download)} files to '{CACHE_FILE}'.")
+            cache_file = open(partial_cache, 'w', encoding='utf-8')
         except Exception as e:
             print(f"Warning: Could not save cache: {e}")
-    else:
-         # Also deduplicate loaded cache just in case
-         unique_files = list(set(tuple(item) for item in all_files_to_download))
-         if len(unique_files) < len(all_files_to_download):
-             print(f"Removed {len(all_files_to_download) - len(unique_files)} duplicate entries from cache.")
-             all_files_to_download = unique_files
+            cache_file = None
+
+        # Keys are (url, save_path); a dict drops duplicates on insert and keeps scan order
+        seen_files = {}
+        try:
+            collect_files(BASE_URL, save_dir, authenticator, seen_files, cache_file)
+        finally:
+            if cache_file is not None:
+                cache_file.close()
+        all_files_to_download = list(seen_files)
+        
+        # Save to cache
+        if cache_file is not None:
+            try:
+                os.replace(partial_cache, CACHE_FILE)
+                print(f"Scan complete. Saved {len(all_files_to_download)} files to '{CACHE_FILE}'.")
+            except Exception as e:
+                print(f"Warning: Could not save cache: {e}")
+
+    # Skip files already known to be complete, without any network round-trip
+    known_sizes.update(load_sizes_cache(SIZES_CACHE_FILE))
+    if known_sizes:
+        local_index = build_local_index(save_dir)
+        remaining_files = filter_completed_files(all_files_to_download, known_sizes, local_index)
+        if len(remaining_files) < len(all_files_to_download):
+            print(f"Skipping {len(all_files_to_download) - len(remaining_files)} files already downloaded.")
+            all_files_to_download = remaining_files
 
     # Phase 2: Download Loop
     print(f"\nPhase 2: Starting download of {len(all_files_to_download)} files with {MAX_WORKERS} threads...")
@@ -489,7 +878,7 @@ def main():
                     for url, path in pending_files
                 }
                 
-                for future in tqdm(as_completed(future_to_file), total=len(pending_files), desc=f"Round {round_num}"):
+                for future in tqdm(as_completed(future_to_file), total=len(pending_files), desc=f"Round {round_num}", smoothing=0):
                     url, path = future_to_file[future]
                     try:
                         success = future.result()